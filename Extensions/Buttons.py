@@ -31,6 +31,8 @@ from sentry_sdk import trace, set_tag
 from .Colors import *  # skipcq: PYL-W0614
 
 verify_cache = {}
+# strong references to fire and forget tasks, the loop only keeps weak ones
+background_tasks = set()
 
 
 class TimedCache(dict):
@@ -881,6 +883,11 @@ class Buttons(Extension):
 
             # send the modal
             await ctx.send_modal(modal)
+            # open the auth connections while the code is pasted, the modal
+            # times out well inside the pool's keep-alive
+            task = asyncio.create_task(self.mcLib.warmup())
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
 
             # wait for the modal to be submitted
             try:
@@ -5,6 +5,7 @@ import re
 import traceback
 from datetime import datetime
 from threading import Thread
+from uuid import UUID
 
 import aiohttp
 import country_converter
@@ -1671,8 +1672,7 @@ class Commands(Extension):
                 )
                 return
 
-            uuid = profile["id"].replace("-", "")
-            uuid = f"{uuid[:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:]}"
+            uuid = str(UUID(hex=profile["id"]))
 
             pipeline = [
                 {
@@ -23,6 +23,12 @@ from pymongo import MongoClient
 from pymongo.errors import ServerSelectionTimeoutError
 from sentry_sdk.integrations.aiohttp import AioHttpIntegration
 
+try:
+    # the same faster loop interactions' Client.start picks when installed
+    import uvloop
+except ImportError:
+    uvloop = None
+
 import pyutils
 from pyutils.scanner import Scanner
 
@@ -221,6 +227,28 @@ async def on_command_error(event):
 # -----------------------------------------------------------------------------
 # bot loop
 
+
+async def run_bot():
+    """Runs the bot, then closes the shared http sessions inside its loop"""
+    try:
+        await bot.astart()
+    finally:
+        await utils.close()
+
+
+def start_bot():
+    """Runs run_bot the way Client.start would, on uvloop when it is installed"""
+    if uvloop is None:
+        asyncio.run(run_bot())
+    elif sys.version_info >= (3, 11):
+        logger.info("uvloop is installed, using it")
+        with asyncio.Runner(loop_factory=uvloop.new_event_loop) as runner:
+            runner.run(run_bot())
+    else:
+        uvloop.install()
+        asyncio.run(run_bot())
+
+
 if __name__ == "__main__":
     """Main loop for the bot
 
@@ -228,7 +256,7 @@ if __name__ == "__main__":
     """
 
     try:
-        bot.start()
+        start_bot()
     except KeyboardInterrupt:
         logger.print("Keyboard interrupt, stopping bot")
         asyncio.run(bot.close())
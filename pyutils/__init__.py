@@ -80,3 +80,8 @@ class Utils:
             server=self.server,
             text=self.text,
         )
+
+    async def close(self):
+        """Closes the shared http sessions, must run in the loop that used them"""
+        await self.mc.close()
+        await self.player.close()
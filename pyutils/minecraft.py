@@ -1,33 +1,91 @@
 import asyncio
-import http.server
+import contextvars
+import functools
 import json
 import os
+import random
+import re
 import secrets
+import socket
+import struct
+import threading
+import time
 import traceback
 import urllib.parse
 import zlib
 from base64 import urlsafe_b64encode
 from hashlib import sha1, sha256
-from http.server import BaseHTTPRequestHandler
-from threading import Thread
-from typing import Tuple, Literal, cast
+from typing import Tuple, Literal, Optional, cast
+from uuid import UUID
 
 import aiohttp
+import aiohttp.abc
+import aiohttp.web
 import mcstatus
-import requests
 import sentry_sdk
-from cryptography.hazmat.backends import default_backend
 from cryptography.hazmat.primitives.asymmetric.padding import PKCS1v15
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.primitives.serialization import load_der_public_key
-from mcstatus.protocol.connection import Connection, TCPSocketConnection
+from mcstatus.protocol.connection import (
+    Connection,
+    TCPAsyncSocketConnection,
+    TCPSocketConnection,
+)
 
 from .logger import Logger
 from .player import Player
 from .server import Server
 from .text import Text
 
-activationCode = None
+try:
+    # libdeflate, the fastest one-shot codec, used for packets when installed
+    import deflate as libdeflate
+except ImportError:
+    libdeflate = None
+
+try:
+    # ISA-L's SIMD deflate, used for packet compression when installed
+    from isal import isal_zlib
+except ImportError:
+    isal_zlib = None
+
+try:
+    # orjson's codec is a drop-in for json.loads/dumps and much faster
+    from orjson import dumps as json_dumps, loads as json_loads
+except ImportError:
+    from json import loads as json_loads
+
+    def json_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+
+try:
+    # c-ares lookups on the event loop instead of getaddrinfo in a thread
+    import aiodns  # noqa: F401
+
+    _Resolver = aiohttp.AsyncResolver
+except ImportError:
+    _Resolver = aiohttp.DefaultResolver
+
+
+# the largest uncompressed packet the protocol allows (2^23 bytes)
+MAX_PACKET_LENGTH = 8388608
+# single byte varints, packet ids and most lengths fit in these
+_SMALL_VARINTS = tuple(bytes((i,)) for i in range(0x80))
+# kick reasons that mark a server as modded or whitelisted, one pass each
+_MODDED_RE = re.compile(r"fml|forge|modded|mods", re.IGNORECASE)
+_WHITELIST_RE = re.compile(r"whitelist", re.IGNORECASE)
+# the handshake's unsigned short port
+_PACK_PORT = struct.Struct(">H").pack
+# padding for the encryption response, stateless so one instance is shared
+_PADDING = PKCS1v15()
+# request headers shared by every auth call, bodies are serialized up front
+_JSON_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+_FORM_HEADERS = {"Content-Type": "application/x-www-form-urlencoded"}
+# a private session for blocking wrappers, whose temporary loop can't use the shared one
+_loop_session: contextvars.ContextVar[Optional[aiohttp.ClientSession]] = (
+    contextvars.ContextVar("_loop_session", default=None)
+)
 
 
 class Minecraft:
@@ -40,7 +98,22 @@ class Minecraft:
     5. Get call the join function for the desired server
     """
 
-    activationCode = None
+    # joins allowed in flight at once, each holds a socket and a login
+    MAX_CONCURRENT_JOINS = 256
+
+    # random bytes for PKCE verifiers and shared secrets, drawn from the OS in bulk
+    _entropy_pool = b""
+    _entropy_offset = 0
+    _entropy_lock = threading.Lock()
+
+    # hosts hit by the login chain
+    AUTH_HOSTS = (
+        "login.microsoftonline.com",
+        "user.auth.xboxlive.com",
+        "xsts.auth.xboxlive.com",
+        "api.minecraftservices.com",
+        "sessionserver.mojang.com",
+    )
 
     class ServerType:
         def __init__(self, ip: str, version: int, status: str):
@@ -54,27 +127,56 @@ class Minecraft:
         def __repr__(self):
             return self.__str__()
 
-    class RequestHandler(BaseHTTPRequestHandler):
-        """Basic request handler for getting the code from microsoft.
+    class AsyncConnection(TCPAsyncSocketConnection):
+        """mcstatus' asyncio tcp connection, tuned for logins.
 
-        Args:
-            BaseHTTPRequestHandler (_type_): the base request handler
+        Every read is bound by the timeout, so a server that accepts the
+        connection but never answers can't stall the event loop.
         """
 
-        def do_GET(self):
-            """Handles the get request from microsoft.
+        __slots__ = ()
+
+        @classmethod
+        async def open(cls, addr: Tuple[str, int], timeout: float = 5.0):
+            """Opens a connection to the given address
 
             Args:
-                self (_type_): the request handler
+                addr (Tuple[str, int]): the host and port to connect to
+                timeout (float, optional): the connect and read deadline. Defaults to 5.0.
+
+            Returns:
+                AsyncConnection: the open connection
             """
-            self.send_response(200)
-            self.send_header("Content-type", "text/html")
-            self.end_headers()
-            self.wfile.write(bytes("Thanks for logging in!", "utf-8"))
-            if "code" in self.path:
-                global activationCode
-                activationCode = self.path.split("=")[1][:-6]
-                self.server.shutdown()
+            conn = cls(addr, timeout)
+            await conn.connect()
+            # asyncio already sets TCP_NODELAY, a login only needs a small receive
+            # window, and acking right away speeds up the lockstep handshake
+            sock = conn.writer.get_extra_info("socket")
+            if sock is not None:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 8192)
+                # reset on close rather than sitting in TIME_WAIT, mass scans
+                # would otherwise run out of ephemeral ports
+                sock.setsockopt(
+                    socket.SOL_SOCKET, socket.SO_LINGER, struct.pack("ii", 1, 0)
+                )
+                if hasattr(socket, "TCP_QUICKACK"):
+                    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_QUICKACK, 1)
+            return conn
+
+        async def read_available(self, timeout: Optional[float] = None) -> bytes:
+            """Reads whatever the server has sent, empty on end of stream"""
+            if timeout is None or timeout > self.timeout:
+                timeout = self.timeout
+            return await asyncio.wait_for(self.reader.read(65536), timeout=timeout)
+
+        def write_buffer(self, *buffers: Connection | bytes):
+            """Frames each packet with its length and sends them all in one write"""
+            out = bytearray()
+            for buffer in buffers:
+                data = buffer if isinstance(buffer, bytes) else buffer.flush()
+                out += Minecraft.encode_varint(len(data))
+                out += data
+            self.writer.write(out)
 
     def __init__(self, logger: Logger, server: Server, player: Player, text: "Text"):
         self.key = os.urandom(16)
@@ -83,6 +185,27 @@ class Minecraft:
         self.player = player
         self.text = text
 
+        # pristine deflate/inflate states, copied per packet instead of
+        # re-initializing zlib's window and tables every call
+        self._deflate = zlib.compressobj(level=1)
+        self._inflate = zlib.decompressobj()
+        # shared http session, see get_session
+        self._http: Optional[aiohttp.ClientSession] = None
+        self._resolver: Optional[aiohttp.abc.AbstractResolver] = None
+        # fire and forget tasks, the loop itself only keeps weak references
+        self._background_tasks: set[asyncio.Task] = set()
+        # when warmup last primed the pool, see warmup
+        self._warmed_at = float("-inf")
+        # oauth code handed over by start_http_server's redirect handler
+        self.activationCode: Optional[str] = None
+        self._activation_event = asyncio.Event()
+        # (ip, port) -> protocol version from a status ping
+        self._protocol_cache: dict[Tuple[str, int], int] = {}
+        # sha256(token) -> whether the account owns the game
+        self._entitlement_cache: dict[bytes, bool] = {}
+        # bounds how many servers join() talks to at once
+        self._join_sem = asyncio.Semaphore(self.MAX_CONCURRENT_JOINS)
+
     async def join(
         self,
         ip: str,
@@ -90,319 +213,333 @@ class Minecraft:
         player_username: str,
         mine_token: str,
         version: int = -1,
+        timeout: float = 5.0,
     ) -> ServerType:
+        """Attempts to log in to a server with the given account
+
+        Args:
+            ip (str): The host to connect to
+            port (int): The port to connect to
+            player_username (str): The username of the account
+            mine_token (str): The minecraft token of the account
+            version (int, optional): The protocol version to use. Defaults to -1 (ask the server).
+            timeout (float, optional): Deadline in seconds for each socket read. Defaults to 5.0.
+
+        Returns:
+            ServerType: The result of the join attempt
+        """
+        async with self._join_sem:
+            return await self._join(
+                ip, port, player_username, mine_token, version, timeout
+            )
+
+    async def _join(
+        self,
+        ip: str,
+        port: int,
+        player_username: str,
+        mine_token: str,
+        version: int,
+        timeout: float,
+    ) -> ServerType:
+        """join() without the concurrency limit, for retries that already hold a slot"""
         try:
             # ----
             # Pre-join checks
             # ----
 
-            # get info on the server
-            server = mcstatus.JavaServer.lookup(ip + ":" + str(port))
-            version = server.status().version.protocol if version == -1 else version
-
-            # get the player's uuid
-            _uuid = await self.player.async_get_uuid(player_username)
-            # set the compression threshold off (<= 0)
-            comp_thresh = 0
+            # the status probe, uuid lookup and entitlement check are independent
+            # round trips (each cached after the first), so run them side by side
+            version, _uuid, owns_game = await asyncio.gather(
+                self.get_protocol(ip, port, version, timeout),
+                self.get_uuid(player_username),
+                self.owns_game(mine_token),
+            )
 
             # needed if a username is invalid
-            if not _uuid:
+            if _uuid is None:
                 self.logger.print("Player UUID not found")
                 return self.ServerType(ip, version, "bad uuid")
 
-            _duuid = _uuid.replace("-", "")
-            _uuid = (
-                f"{_uuid[:8]}-{_uuid[8:12]}-{_uuid[12:16]}-{_uuid[16:20]}-{_uuid[20:]}"
-            )
-            # check if the account owns the game
-            async with aiohttp.ClientSession() as httpSession:
-                url = "https://api.minecraftservices.com/entitlements/mcstore"
-                async with httpSession.get(
-                    url,
-                    headers={
-                        "Authorization": f"Bearer {mine_token}",
-                        "Content-Type": "application/json",
-                    },
-                ) as res:
-                    if res.status == 200:
-                        items = (await res.json()).get("items", [])
+            # set the compression threshold off (<= 0)
+            comp_thresh = 0
+            if owns_game is None:
+                return self.ServerType(ip, version, "BAD_TOKEN")
 
-                        # make sure the account owns the game
-                        if len(items) == 0:
-                            self.logger.print("Account does not own the game")
-                            return self.ServerType(ip, version, "NO_GAME")
-                    else:
-                        self.logger.print("Failed to check if account owns the game")
-                        self.logger.error(res.text)
-                        return self.ServerType(ip, version, "BAD_TOKEN")
+            # make sure the account owns the game
+            if not owns_game:
+                self.logger.print("Account does not own the game")
+                return self.ServerType(ip, version, "NO_GAME")
 
             # ----
             # C->S: Handshake
             # ----
 
             # connect to the server via tcp socket
-            connection = TCPSocketConnection((ip, port))
+            # every read on this connection is bound by the timeout
+            connection = await self.AsyncConnection.open((ip, port), timeout)
+            try:
+                # Send a handshake packet: ID, protocol version, server address, server port, intention to log in
+                # This does not change between versions
+                # Packet ID and protocol version are cached per version
+                ip_bytes = ip.encode("utf-8")
+                handshake = (
+                    self.handshake_prefix(version)
+                    + self.encode_varint(len(ip_bytes))
+                    + ip_bytes  # Server address
+                    + _PACK_PORT(int(port))  # Server port
+                    + b"\x02"  # Intention to login
+                )
 
-            # Send a handshake packet: ID, protocol version, server address, server port, intention to log in
-            # This does not change between versions
-            handshake = Connection()
+                # ----
+                # c->S: Login Start
+                # ----
 
-            handshake.write_varint(0)  # Packet ID
-            handshake.write_varint(version)  # Protocol version
-            handshake.write_utf(ip)  # Server address
-            handshake.write_ushort(int(port))  # Server port
-            handshake.write_varint(2)  # Intention to login
+                if len(player_username) > 16:
+                    self.logger.print("Username too long")
+                    return self.ServerType(ip, version, "BAD_USERNAME")
+                # the same for every server on this version, so it is cached
+                loginStart = self.login_start_packet(
+                    version, player_username, _uuid.bytes
+                )
 
-            connection.write_buffer(handshake)
-            self.logger.debug("Sent handshake packet")
+                # sent together in a single write
+                connection.write_buffer(handshake, loginStart)
+                self.logger.debug("Sent handshake and login start packets")
 
-            # ----
-            # c->S: Login Start
-            # ----
+                # ----
+                # S->C: Encryption Request and/or Compression
+                # ----
 
-            # Send login start packet: ID, username, include sig data, has uuid, uuid
-            loginStart = Connection()
+                # Read response
+                try:
+                    response = await connection.read_buffer()
+                except (TimeoutError, asyncio.TimeoutError):
+                    self.logger.print("Server did not respond in time")
+                    return self.ServerType(ip, version, "OFFLINE:Timeout")
+                except OSError:
+                    self.logger.print("No response from server")
+                    return self.ServerType(ip, version, "OFFLINE")
 
-            loginStart.write_varint(0)  # Packet ID
-            if len(player_username) > 16:
-                self.logger.print("Username too long")
-                return self.ServerType(ip, version, "BAD_USERNAME")
-            loginStart.write_utf(player_username)  # Username
+                _id: int = self.read_varint(response)
+                self.logger.debug("Received packet ID:", _id)
 
-            if version > 758:
-                # older protocols don't want the uuid
-                # https://wiki.vg/index.php?title=Protocol&oldid=16918#Login_Start
-                self.logger.debug("Sending uuid")
+                if _id == 0x03:
+                    self.logger.print("Setting compression")
+                    comp_thresh = self.read_varint(response)
+                    self.logger.print(f"Compression threshold: {comp_thresh}")
+
+                    response = self.read_compressed(await connection.read_buffer())
+                    _id: int = self.read_varint(response)
+
+                if _id == 0x02:
+                    self.logger.print("Logged in successfully")
+                    return self.ServerType(ip, version, "CRACKED")
+                elif _id == 0x00:
+                    self.logger.print(f"Failed to login, vers: {version}")
+                    reason = json_loads(response.read_utf())
+                    reason = self.read_chat(reason)
+                    self.logger.print(reason)
 
-                if version <= 760:
-                    # a few want signature data
-                    # https://wiki.vg/index.php?title=Protocol&oldid=17753#Login_Start
-                    loginStart.write_bool(False)  # has sig data
+                    if _MODDED_RE.search(reason):
+                        return self.ServerType(ip, version, "MODDED")
+                    elif _WHITELIST_RE.search(reason):
+                        return self.ServerType(ip, version, "WHITELISTED")
+                    elif reason.startswith("multiplayer.disconnect.incompatible:"):
+                        vers = reason.split(":")[1].strip()
+                        protocol = self.text.protocol_int(vers)
+                        # the cached protocol is stale, later joins shouldn't
+                        # get kicked for it again
+                        if protocol == -1:
+                            self._protocol_cache.pop((ip, port), None)
+                        else:
+                            self._protocol_cache[(ip, port)] = protocol
+
+                        return await self._join(
+                            ip=ip,
+                            port=port,
+                            player_username=player_username,
+                            version=protocol,
+                            mine_token=mine_token,
+                            timeout=timeout,
+                        )
 
-                if version in [760, 761, 762, 763]:
-                    # these want the uuid sometimes
-                    # https://wiki.vg/index.php?title=Protocol&oldid=18375#Login_Start
-                    loginStart.write_bool(True)  # has uuid
+                    return self.ServerType(ip, version, "UNKNOWN")
+                elif _id == 0x04:
+                    # load plugin request
+                    self.logger.debug("Loading plugins")
 
-                # write uuid by splitting it into two 64-bit integers
-                uuid1 = int(_duuid[:16], 16)
-                uuid2 = int(_duuid[16:], 16)
-                loginStart.write_ulong(uuid1)
-                loginStart.write_ulong(uuid2)
+                    message_id, channel, data = self.read_plugin(response)
 
-            connection.write_buffer(loginStart)
-            self.logger.debug("Sent login start packet")
+                    self.logger.debug("Message ID:", message_id)
+                    self.logger.debug("Channel:", channel)
+                    self.logger.debug("Data:", data)
 
-            # ----
-            # S->C: Encryption Request and/or Compression
-            # ----
-
-            # Read response
-            try:
-                response = connection.read_buffer()
-            except OSError:
-                self.logger.print("No response from server")
-                return self.ServerType(ip, version, "OFFLINE")
-
-            _id: int = response.read_varint()
-            self.logger.debug("Received packet ID:", _id)
-
-            if _id == 0x03:
-                self.logger.print("Setting compression")
-                comp_thresh = response.read_varint()
-                self.logger.print(f"Compression threshold: {comp_thresh}")
-
-                response = self.read_compressed(connection)
-                _id: int = response.read_varint()
-
-            if _id == 0x02:
-                self.logger.print("Logged in successfully")
-                return self.ServerType(ip, version, "CRACKED")
-            elif _id == 0x00:
-                self.logger.print(f"Failed to login, vers: {version}")
-                reason = json.loads(response.read_utf())
-                reason = self.read_chat(reason)
-                self.logger.print(reason)
-
-                if any(i in reason.lower() for i in ["fml", "forge", "modded", "mods"]):
                     return self.ServerType(ip, version, "MODDED")
-                elif any(i in reason.lower() for i in ["whitelist", "not whitelisted"]):
-                    return self.ServerType(ip, version, "WHITELISTED")
-                elif reason.startswith("multiplayer.disconnect.incompatible:"):
-                    vers = reason.split(":")[1].strip()
-                    protocol = self.text.protocol_int(vers)
-
-                    return await self.join(
-                        ip=ip,
-                        port=port,
-                        player_username=player_username,
-                        version=protocol,
-                        mine_token=mine_token,
-                    )
-
-                return self.ServerType(ip, version, "UNKNOWN")
-            elif _id == 0x04:
-                # load plugin request
-                self.logger.debug("Loading plugins")
+                elif _id == 0x01:
+                    self.logger.debug("Encryption requested")
+                    if mine_token is None:
+                        return self.ServerType(ip, version, "PREMIUM")
+
+                    # ----
+                    # Setup our encryption
+                    # ----
+
+                    # Read encryption request
+                    # read straight into bytes, the crypto calls and caches need them
+                    length = self.read_varint(response)
+                    server_id = self.read_bytes(response, length)
+                    length = self.read_varint(response)
+                    public_key = self.read_bytes(response, length)
+                    length = self.read_varint(response)
+                    try:
+                        verify_token = self.read_bytes(response, length)
+                    except OSError:
+                        self.logger.print("Weird packet")
+                        verify_token = self.read_bytes(response, response.remaining())
+                        if self.logger.DEBUG:
+                            self.logger.debug(
+                                f"Length mismatch: {length} != {len(verify_token)}"
+                            )
+                            self.logger.debug(
+                                f"Server id: {server_id.hex()}\n"
+                                f"Public key: {public_key.hex()}\n"
+                                f"Verify token: {verify_token.hex()}"
+                            )
+
+                    shared_secret = self._entropy(16)
+
+                    # create the server hash
+                    # https://wiki.vg/Protocol_Encryption#Client
+                    # the secret sits between id and key, so only the id prefix is reusable
+                    shaHash = self.server_hash_prefix(server_id).copy()
+                    shaHash.update(shared_secret)
+                    shaHash.update(public_key)
+                    verify_hash = self.minecraft_sha1_hexdigest(shaHash.digest())
+
+                    if self.logger.DEBUG:
+                        # only format the key material when debugging is on
+                        self.logger.debug(
+                            f"Server id: {server_id.hex()}, "
+                            f"verify token: {verify_token.hex()}, "
+                            f"shared secret: {shared_secret.hex()}, "
+                            f"verify hash: {verify_hash}"
+                        )
 
-                message_id, channel, data = self.read_plugin(connection)
+                    # load the public key into an object, so we can use it to encrypt bytes
+                    pubKey = self.load_public_key(public_key)
 
-                self.logger.debug("Message ID:", message_id)
-                self.logger.debug("Channel:", channel)
-                self.logger.debug("Data:", data)
+                    # create a cipher object to encrypt the packet after encryption response
+                    # use the shared secret as the key and iv
+                    cipher = Cipher(
+                        # key
+                        algorithms.AES(shared_secret),
+                        # iv
+                        modes.CFB8(shared_secret),
+                    )
+                    encryptor = cipher.encryptor()
+                    decryptor = cipher.decryptor()
 
-                return self.ServerType(ip, version, "MODDED")
-            elif _id == 0x01:
-                self.logger.debug("Encryption requested")
-                if mine_token is None:
-                    return self.ServerType(ip, version, "PREMIUM")
+                    # ----
+                    # Client Auth
+                    # ----
 
-                # ----
-                # Setup our encryption
-                # ----
+                    # send a request to mojang servers to request that we are joining a server
+                    self.logger.debug("Sending authentication request")
+                    if await self.session_join(
+                        mine_token=mine_token,
+                        server_hash=verify_hash,
+                        _uuid=_uuid.hex,
+                        name=player_username,
+                    ):
+                        self.logger.print("Failed to authenticate account")
+                        # the token may have expired, check it again next time
+                        self._entitlement_cache.pop(self._token_key(mine_token), None)
+                        return self.ServerType(ip, version, "BAD_AUTH")
+
+                    # ----
+                    # Encryption Response
+                    # ----
+
+                    # send encryption response
+                    self.logger.debug("Sending encryption response")
+                    # rsa is cpu bound, so keep it off the event loop
+                    encryptedSharedSecret, encryptedVerifyToken = await asyncio.gather(
+                        asyncio.to_thread(pubKey.encrypt, shared_secret, _PADDING),
+                        asyncio.to_thread(pubKey.encrypt, verify_token, _PADDING),
+                    )
 
-                # Read encryption request
-                length = response.read_varint()
-                server_id = response.read(length)
-                length = response.read_varint()
-                public_key = response.read(length)
-                length = response.read_varint()
-                try:
-                    verify_token = response.read(length)
-                except OSError:
-                    self.logger.print("Weird packet")
-                    verify_token = response.read(response.remaining())
-                    self.logger.debug(
-                        f"Length mismatch: {length} != {len(verify_token)}"
+                    encryptionResponse = Connection()
+                    encryptionResponse.write(b"\x01")  # Packet ID
+                    encryptionResponse.write(
+                        self.encode_varint(len(encryptedSharedSecret))
                     )
-                    self.logger.debug(
-                        f"Server id: {server_id}\nPublic key: {public_key}\nVerify token: {verify_token}"
+                    encryptionResponse.write(encryptedSharedSecret)
+                    encryptionResponse.write(
+                        self.encode_varint(len(encryptedVerifyToken))
                     )
+                    encryptionResponse.write(encryptedVerifyToken)
 
-                shared_secret = os.urandom(16)
-
-                # change verify_token to bytes form bytearray
-                verify_token = bytes(verify_token)
-                public_key = bytes(public_key)
-                server_id = bytes(server_id)
-
-                # create the server hash
-                # https://wiki.vg/Protocol_Encryption#Client
-                shaHash = sha1()  # skipcq: PTC-W1003
-                shaHash.update(server_id)
-                shaHash.update(shared_secret)
-                shaHash.update(public_key)
-                verify_hash = shaHash.hexdigest()
-
-                print(
-                    f"Server id: {server_id}\n"
-                    f"Public key: {public_key}\n"
-                    f"Verify token: {verify_token}\n"
-                    f"Shared secret: {shared_secret}\n"
-                    f"Verify hash: {verify_hash}"
-                )
-
-                # load the public key into an object, so we can use it to encrypt bytes
-                pubKey = load_der_public_key(public_key, default_backend())
+                    self.compress_packet(encryptionResponse, connection, comp_thresh)
+                    self.logger.debug("Sent encryption response")
 
-                # create a cipher object to encrypt the packet after encryption response
-                # use the shared secret as the key and iv
-                cipher = Cipher(
-                    # key
-                    algorithms.AES(shared_secret),
-                    # iv
-                    modes.CFB8(shared_secret),
-                )
-                encryptor = cipher.encryptor()
-                decryptor = cipher.decryptor()
+                    # ----
+                    # Login Success and/or Set Compression
+                    # ----
 
-                # ----
-                # Client Auth
-                # ----
-
-                # send a request to mojang servers to request that we are joining a server
-                self.logger.debug("Sending authentication request")
-                if await self.session_join(
-                    mine_token=mine_token,
-                    server_hash=verify_hash,
-                    _uuid=_duuid,
-                    name=player_username,
-                ):
-                    self.logger.print("Failed to authenticate account")
-                    return self.ServerType(ip, version, "BAD_AUTH")
-
-                # ----
-                # Encryption Response
-                # ----
-
-                # send encryption response
-                self.logger.debug("Sending encryption response")
-                encryptedSharedSecret = pubKey.encrypt(shared_secret, PKCS1v15())
-                encryptedVerifyToken = pubKey.encrypt(verify_token, PKCS1v15())
-
-                encryptionResponse = Connection()
-                encryptionResponse.write_varint(1)  # Packet ID
-                encryptionResponse.write_varint(len(encryptedSharedSecret))
-                encryptionResponse.write(encryptedSharedSecret)
-                encryptionResponse.write_varint(len(encryptedVerifyToken))
-                encryptionResponse.write(encryptedVerifyToken)
-
-                self.compress_packet(encryptionResponse, connection, comp_thresh)
-                self.logger.debug("Sent encryption response")
-
-                # ----
-                # Login Success and/or Set Compression
-                # ----
-
-                unc = self.read_enc(connection, decryptor)
-                if comp_thresh > 0:
-                    unc = self.read_compressed(unc)
-
-                _id = unc.read_varint()
-                self.logger.debug("Received packet ID:", _id)
+                    unc = await self.read_enc(connection, decryptor)
+                    if comp_thresh > 0:
+                        unc = self.read_compressed(unc)
 
-                if _id == 0x03:
-                    self.logger.print("Keep alive Packet")
+                    _id = self.read_varint(unc)
+                    self.logger.debug("Received packet ID:", _id)
 
-                    keep_id = unc.read_varint()
-                    self.logger.debug("Keep alive ID:", keep_id)
+                    if _id == 0x03:
+                        self.logger.print("Keep alive Packet")
 
-                    # send keep alive packet
-                    keep_alive = Connection()
+                        keep_id = self.read_varint(unc)
+                        self.logger.debug("Keep alive ID:", keep_id)
 
-                    keep_alive.write_varint(0x03)
-                    keep_alive.write_varint(keep_id)
+                        # send keep alive packet
+                        keep_alive = Connection()
 
-                    self.compress_packet(keep_alive, connection, comp_thresh, encryptor)
+                        keep_alive.write(b"\x03")  # Packet ID
+                        keep_alive.write(self.encode_varint(keep_id))
 
-                    # read response
-                    unc = self.read_enc(connection, decryptor)
-                    if comp_thresh > 0:
-                        unc = self.read_compressed(unc)
+                        self.compress_packet(
+                            keep_alive, connection, comp_thresh, encryptor
+                        )
 
-                    _id = unc.read_varint()
-                    self.logger.debug("Received packet ID:", _id)
+                        # read response
+                        unc = await self.read_enc(connection, decryptor)
+                        if comp_thresh > 0:
+                            unc = self.read_compressed(unc)
 
-                if _id == 0x00:
-                    reason = self.read_chat(unc.read_utf())
-                    self.logger.print(reason)
-                ...
+                        _id = self.read_varint(unc)
+                        self.logger.debug("Received packet ID:", _id)
 
-                return self.ServerType(ip, version, "PREMIUM")
+                    if _id == 0x00:
+                        reason = self.read_chat(unc.read_utf())
+                        self.logger.print(reason)
+                    ...
 
-            # ----
-            # Something went wrong
-            # ----
+                    return self.ServerType(ip, version, "PREMIUM")
 
-            self.logger.info("Unknown response: " + str(_id))
-            try:
-                reason = response.read_utf()
-            except UnicodeDecodeError:
-                reason = "Unknown"
+                # ----
+                # Something went wrong
+                # ----
 
-            self.logger.info("Reason: " + reason)
-            return self.ServerType(ip, version, "UNKNOWN: " + reason)
-        except TimeoutError:
+                self.logger.info("Unknown response: " + str(_id))
+                try:
+                    reason = response.read_utf()
+                except UnicodeDecodeError:
+                    reason = "Unknown"
+
+                self.logger.info("Reason: " + reason)
+                return self.ServerType(ip, version, "UNKNOWN: " + reason)
+            finally:
+                connection.close()
+        except (TimeoutError, asyncio.TimeoutError):
             return self.ServerType(ip, version, "OFFLINE:Timeout")
         except ConnectionRefusedError:
             return self.ServerType(ip, version, "OFFLINE:ConnectionRefused")
@@ -415,146 +552,23 @@ class Minecraft:
             return self.ServerType(ip, version, "OFFLINE")
 
     async def get_minecraft_token_async(
-        self, clientID, redirect_uri, act_code, verify_code=None
+        self, clientID, redirect_uri, act_code, verify_code=None, with_profile=True
     ) -> dict:
-        async with aiohttp.ClientSession() as httpSession:
-            # get the access token
-            endpoint = "https://login.microsoftonline.com/consumers/oauth2/v2.0/token"
-            params = {
-                "client_id": clientID,
-                "scope": "XboxLive.signin",
-                "code": act_code,
-                "redirect_uri": redirect_uri,
-                "grant_type": "authorization_code",
-            }
-            if verify_code:
-                params["code_verifier"] = verify_code
-
-            async with httpSession.post(
-                endpoint,
-                data=params,
-                headers={
-                    "Content-Type": "application/x-www-form-urlencoded",
-                },
-            ) as res:
-                # get the access token
-                if res.status == 200:
-                    rjson = await res.json()
-                    accessToken = rjson["access_token"]
-                else:
-                    self.logger.print("Failed to get access token")
-                    try:
-                        error_j = await res.json()
-                        self.logger.error(
-                            error_j["error"], error_j["error_description"]
-                        )
-                    except KeyError:
-                        self.logger.error(res.reason)
-                    return {"type": "error", "error": "Failed to get access token"}
-
-            # obtain xbl token
-            url = "https://user.auth.xboxlive.com/user/authenticate"
-            async with httpSession.post(
-                url,
-                json={
-                    "Properties": {
-                        "AuthMethod": "RPS",
-                        "SiteName": "user.auth.xboxlive.com",
-                        "RpsTicket": f"d={accessToken}",
-                    },
-                    "RelyingParty": "http://auth.xboxlive.com",  # changed from http -> https
-                    "TokenType": "JWT",
-                },
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                },
-            ) as res2:
-                if res2.status == 200:
-                    xblToken = (await res2.json())["Token"]
-                else:
-                    self.logger.print("Failed to verify account: ", res2.status)
-                    self.logger.error(res2.reason)
-                    self.logger.error(res2.text)
-                    return {"type": "error", "error": "Failed to verify account"}
-
-            # obtain xsts token
-            url = "https://xsts.auth.xboxlive.com/xsts/authorize"
-            async with httpSession.post(
-                url,
-                json={
-                    "Properties": {
-                        "SandboxId": "RETAIL",
-                        "UserTokens": [xblToken],
-                    },
-                    "RelyingParty": "rp://api.minecraftservices.com/",
-                    "TokenType": "JWT",
-                },
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                },
-            ) as res3:
-                if res3.status == 200:
-                    xstsToken = (await res3.json())["Token"]
-                else:
-                    self.logger.print("Failed to obtain xsts token")
-                    self.logger.error(res3.reason)
-                    return {"type": "error", "error": "Failed to obtain xsts token"}
-
-            # obtain minecraft token
-            xuid = (await res3.json())["DisplayClaims"]["xui"][0]["uhs"]
-            url = "https://api.minecraftservices.com/authentication/login_with_xbox"
-            async with httpSession.post(
-                url,
-                json={
-                    "identityToken": f"XBL3.0 x={xuid};{xstsToken}",
-                },
-                headers={
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                },
-            ) as res4:
-                if res4.status == 200:
-                    minecraftToken = (await res4.json())["access_token"]
-                    self.logger.print("Got Minecraft token")
-                else:
-                    self.logger.print("Failed to obtain minecraft token")
-                    self.logger.error(res4.reason)
-                    return {
-                        "type": "error",
-                        "error": "Failed to obtain minecraft token",
-                    }
-
-            # get the profile
-            url = "https://api.minecraftservices.com/minecraft/profile"
-            async with httpSession.get(
-                url,
-                headers={
-                    "Authorization": f"Bearer {minecraftToken}",
-                    "Content-Type": "application/json",
-                    "Accept": "application/json",
-                },
-            ) as res5:
-                if res5.status == 200 and "error" not in str(await res5.json()):
-                    uuid = (await res5.json())["id"]
-                    name = (await res5.json())["name"]
-                    self.logger.print("Name: " + name + " UUID: " + uuid)
-                else:
-                    self.logger.print("Failed to obtain profile")
-                    self.logger.error(res5.reason)
-                    return {"type": "error", "error": "Failed to obtain profile"}
+        """Runs the microsoft -> xbox -> minecraft token chain.
 
-            return {
-                "type": "success",
-                "uuid": uuid,
-                "name": name,
-                "minecraft_token": minecraftToken,
-            }
+        Args:
+            clientID (str): the azure client id
+            redirect_uri (str): the redirect uri registered for the client
+            act_code (str): the activation code from microsoft
+            verify_code (str, optional): the PKCE code verifier
+            with_profile (bool, optional): wait for the profile before returning.
+                If False the result has the token and the still running profile
+                lookup as "profile_task"
 
-    def get_minecraft_token(
-        self, clientID, redirect_uri, act_code, verify_code=None
-    ) -> dict:
+        Returns:
+            dict: {"type": "success", ...} or {"type": "error", "error": ...}
+        """
+        httpSession = await self.get_session()
         # get the access token
         endpoint = "https://login.microsoftonline.com/consumers/oauth2/v2.0/token"
         params = {
@@ -566,120 +580,220 @@ class Minecraft:
         }
         if verify_code:
             params["code_verifier"] = verify_code
-        res = requests.post(
+
+        async with httpSession.post(
             endpoint,
             data=params,
-            headers={
-                "Content-Type": "application/x-www-form-urlencoded",
-            },
-        )
-        # get the access token
-        if res.status_code == 200:
-            rjson = res.json()
-            accessToken = rjson["access_token"]
-        else:
-            self.logger.print("Failed to get access token")
-            try:
-                error_j = res.json()
-                self.logger.error(error_j["error"], error_j["error_description"])
-            except KeyError:
-                self.logger.error(res.reason)
-            return {"type": "error", "error": "Failed to get access token"}
+            headers=_FORM_HEADERS,
+        ) as res:
+            # get the access token
+            if res.status == 200:
+                rjson = json_loads(await res.read())
+                accessToken = rjson["access_token"]
+            else:
+                self.logger.print("Failed to get access token")
+                try:
+                    error_j = json_loads(await res.read())
+                    self.logger.error(error_j["error"], error_j["error_description"])
+                except (KeyError, ValueError):  # not a json error body
+                    self.logger.error(res.reason)
+                return {"type": "error", "error": "Failed to get access token"}
 
         # obtain xbl token
         url = "https://user.auth.xboxlive.com/user/authenticate"
-        res2 = requests.post(
+        async with httpSession.post(
             url,
-            json={
-                "Properties": {
-                    "AuthMethod": "RPS",
-                    "SiteName": "user.auth.xboxlive.com",
-                    "RpsTicket": f"d={accessToken}",
-                },
-                "RelyingParty": "http://auth.xboxlive.com",  # changed from http -> https
-                "TokenType": "JWT",
-            },
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-        )
-        if res2.status_code == 200:
-            xblToken = res2.json()["Token"]
-            self.logger.print("Verified account: " + xblToken)
-        else:
-            self.logger.print("Failed to verify account: ", res2.status_code)
-            self.logger.error(res2.reason)
-            self.logger.error(res2.text)
-            return {"type": "error", "error": "Failed to verify account"}
+            data=json_dumps(
+                {
+                    "Properties": {
+                        "AuthMethod": "RPS",
+                        "SiteName": "user.auth.xboxlive.com",
+                        "RpsTicket": f"d={accessToken}",
+                    },
+                    "RelyingParty": "http://auth.xboxlive.com",  # changed from http -> https
+                    "TokenType": "JWT",
+                }
+            ),
+            headers=_JSON_HEADERS,
+        ) as res2:
+            if res2.status == 200:
+                xblToken = (json_loads(await res2.read()))["Token"]
+            else:
+                self.logger.print("Failed to verify account: ", res2.status)
+                self.logger.error(res2.reason)
+                self.logger.error(await res2.text())
+                return {"type": "error", "error": "Failed to verify account"}
 
         # obtain xsts token
         url = "https://xsts.auth.xboxlive.com/xsts/authorize"
-        res3 = requests.post(
+        async with httpSession.post(
             url,
-            json={
-                "Properties": {
-                    "SandboxId": "RETAIL",
-                    "UserTokens": [xblToken],
-                },
-                "RelyingParty": "rp://api.minecraftservices.com/",
-                "TokenType": "JWT",
-            },
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-        )
-        if res3.status_code == 200:
-            xstsToken = res3.json()["Token"]
-            self.logger.print("Got xsts token: " + xstsToken)
-        else:
-            self.logger.print("Failed to obtain xsts token")
-            self.logger.error(res3.reason)
-            return {"type": "error", "error": "Failed to obtain xsts token"}
+            data=json_dumps(
+                {
+                    "Properties": {
+                        "SandboxId": "RETAIL",
+                        "UserTokens": [xblToken],
+                    },
+                    "RelyingParty": "rp://api.minecraftservices.com/",
+                    "TokenType": "JWT",
+                }
+            ),
+            headers=_JSON_HEADERS,
+        ) as res3:
+            if res3.status == 200:
+                xsts = json_loads(await res3.read())
+                xstsToken = xsts["Token"]
+            else:
+                self.logger.print("Failed to obtain xsts token")
+                self.logger.error(res3.reason)
+                return {"type": "error", "error": "Failed to obtain xsts token"}
 
         # obtain minecraft token
-        xuid = res3.json()["DisplayClaims"]["xui"][0]["uhs"]
+        xuid = xsts["DisplayClaims"]["xui"][0]["uhs"]
         url = "https://api.minecraftservices.com/authentication/login_with_xbox"
-        res4 = requests.post(
+        async with httpSession.post(
             url,
-            json={
-                "identityToken": f"XBL3.0 x={xuid};{xstsToken}",
-            },
-            headers={
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-        )
-        if res4.status_code == 200:
-            minecraftToken = res4.json()["access_token"]
-            self.logger.print("Got xuid: " + xuid)
-        else:
-            self.logger.print("Failed to obtain minecraft token")
-            self.logger.error(res4.reason)
+            data=json_dumps(
+                {
+                    "identityToken": f"XBL3.0 x={xuid};{xstsToken}",
+                }
+            ),
+            headers=_JSON_HEADERS,
+        ) as res4:
+            if res4.status == 200:
+                minecraftToken = (json_loads(await res4.read()))["access_token"]
+                self.logger.print("Got Minecraft token")
+            else:
+                self.logger.print("Failed to obtain minecraft token")
+                self.logger.error(res4.reason)
+                return {
+                    "type": "error",
+                    "error": "Failed to obtain minecraft token",
+                }
+
+        # both only need the minecraft token, so run them side by side
+        profile_task = asyncio.create_task(self.get_profile(minecraftToken))
+        entitlement_task = asyncio.create_task(self.owns_game(minecraftToken))
+        # the entitlement check is only a cache warmup, the login neither waits
+        # for it nor fails on it, it just finishes in the background
+        self._background_tasks.add(entitlement_task)
+        entitlement_task.add_done_callback(self._finish_background_task)
+        if not with_profile:
             return {
-                "type": "error",
-                "error": "Failed to obtain minecraft token",
+                "type": "success",
+                "minecraft_token": minecraftToken,
+                "profile_task": profile_task,
             }
 
-        # get the profile
+        return await profile_task
+
+    def _finish_background_task(self, task: asyncio.Task):
+        """Drops a finished background task, retrieving its exception"""
+        self._background_tasks.discard(task)
+        if not task.cancelled():
+            task.exception()
+
+    async def get_protocol(
+        self, ip: str, port: int, version: int = -1, timeout: float = 5.0
+    ) -> int:
+        """Asks a server for its protocol version, unless it is already known.
+
+        Args:
+            ip (str): The host of the server
+            port (int): The port of the server
+            version (int, optional): A known version, returned as is. Defaults to -1.
+            timeout (float, optional): Deadline for the status ping. Defaults to 5.0.
+
+        Returns:
+            int: The protocol version
+        """
+        if version == -1:
+            version = self._protocol_cache.get((ip, port), -1)
+        if version == -1:
+            # the port is always known, so there is no SRV record to look up
+            server = mcstatus.JavaServer(ip, int(port), timeout=timeout)
+            version = (await server.async_status()).version.protocol
+            if len(self._protocol_cache) >= 1024:
+                self._protocol_cache.clear()
+            self._protocol_cache[(ip, port)] = version
+        return version
+
+    async def get_uuid(self, player_username: str) -> Optional[UUID]:
+        """Gets the uuid of an account, Player caches the lookup.
+
+        Args:
+            player_username (str): The username of the account
+
+        Returns:
+            UUID: The uuid, None if the username doesn't exist
+        """
+        _uuid = await self.player.async_get_uuid(player_username)
+        if not _uuid:
+            return None
+
+        # parse once, the raw bytes go in login start and the hex to mojang
+        return UUID(_uuid)
+
+    @staticmethod
+    def _token_key(mine_token: str) -> bytes:
+        """Hashes a token for use as a cache key, so the token itself isn't kept"""
+        return sha256(str(mine_token).encode()).digest()
+
+    async def owns_game(self, mine_token: str) -> Optional[bool]:
+        """Checks if an account owns the game, once per token.
+
+        Args:
+            mine_token (str): the minecraft token of the account
+
+        Returns:
+            bool: whether the account owns the game, None if the check failed
+        """
+        token_key = self._token_key(mine_token)
+        owns_game = self._entitlement_cache.get(token_key)
+        if owns_game is not None:
+            return owns_game
+
+        httpSession = await self.get_session()
+        url = "https://api.minecraftservices.com/entitlements/mcstore"
+        async with httpSession.get(
+            url,
+            headers={**_JSON_HEADERS, "Authorization": f"Bearer {mine_token}"},
+        ) as res:
+            if res.status != 200:
+                self.logger.print("Failed to check if account owns the game")
+                self.logger.error(await res.text())
+                return None
+
+            items = (json_loads(await res.read())).get("items", [])
+
+        owns_game = len(items) > 0
+        self._entitlement_cache[token_key] = owns_game
+        return owns_game
+
+    async def get_profile(self, minecraftToken: str) -> dict:
+        """Gets the name and uuid of the account a minecraft token belongs to.
+
+        Args:
+            minecraftToken (str): the minecraft access token
+
+        Returns:
+            dict: the same shape as get_minecraft_token_async's result
+        """
+        httpSession = await self.get_session()
         url = "https://api.minecraftservices.com/minecraft/profile"
-        res5 = requests.get(
+        async with httpSession.get(
             url,
-            headers={
-                "Authorization": f"Bearer {minecraftToken}",
-                "Content-Type": "application/json",
-                "Accept": "application/json",
-            },
-        )
-        if res5.status_code == 200 and "error" not in str(res5.json()):
-            uuid = res5.json()["id"]
-            name = res5.json()["name"]
-            self.logger.print("Name: " + name + " UUID: " + uuid)
-        else:
-            self.logger.print("Failed to obtain profile")
-            self.logger.error(res5.reason)
-            return {"type": "error", "error": "Failed to obtain profile"}
+            headers={**_JSON_HEADERS, "Authorization": f"Bearer {minecraftToken}"},
+        ) as res5:
+            profile = json_loads(await res5.read()) if res5.status == 200 else {}
+            if res5.status == 200 and "error" not in profile:
+                uuid = profile["id"]
+                name = profile["name"]
+                self.logger.print("Name: " + name + " UUID: " + uuid)
+            else:
+                self.logger.print("Failed to obtain profile")
+                self.logger.error(res5.reason)
+                return {"type": "error", "error": "Failed to obtain profile"}
 
         return {
             "type": "success",
@@ -688,6 +802,21 @@ class Minecraft:
             "minecraft_token": minecraftToken,
         }
 
+    def get_minecraft_token(
+        self, clientID, redirect_uri, act_code, verify_code=None
+    ) -> dict:
+        """Blocking wrapper around get_minecraft_token_async for callers without an event loop"""
+
+        async def run():
+            # the shared session may belong to the bot's loop, leave it alone
+            async with aiohttp.ClientSession() as session:
+                _loop_session.set(session)
+                return await self.get_minecraft_token_async(
+                    clientID, redirect_uri, act_code, verify_code
+                )
+
+        return asyncio.run(run())
+
     @staticmethod
     def get_activation_code_url(clientID, redirect_uri):
         """Returns a url to get the activation code from microsoft."""
@@ -700,25 +829,20 @@ class Minecraft:
 
         base_url = "https://login.microsoftonline.com/consumers/oauth2/v2.0/authorize"
 
-        return (
-            urllib.parse.urlparse(base_url)
-            ._replace(
-                query=urllib.parse.urlencode(
-                    {
-                        "client_id": clientID,
-                        "response_type": "code",
-                        "redirect_uri": redirect_uri,
-                        "response_mode": "query",
-                        "scope": "XboxLive.signin offline_access",
-                        "prompt": "select_account",
-                        "code_challenge": code_challenge,
-                        "code_challenge_method": code_challenge_method,
-                    }
-                )
-            )
-            .geturl(),
-            code_verifier,
+        # the base has no query of its own, so the parameters are just appended
+        query = urllib.parse.urlencode(
+            {
+                "client_id": clientID,
+                "response_type": "code",
+                "redirect_uri": redirect_uri,
+                "response_mode": "query",
+                "scope": "XboxLive.signin offline_access",
+                "prompt": "select_account",
+                "code_challenge": code_challenge,
+                "code_challenge_method": code_challenge_method,
+            }
         )
+        return base_url + "?" + query, code_verifier
 
     def get_activation_code(self):
         """Returns the activation code from the server.
@@ -726,20 +850,73 @@ class Minecraft:
         Returns:
             str: the activation code
         """
-        act = self.activationCode
-        return act
+        return self.activationCode
+
+    async def wait_for_activation_code(self, timeout: float = 120) -> Optional[str]:
+        """Waits for start_http_server to receive the activation code.
 
-    def start_http_server(self, port: int = 80):
-        """spawns the server in a new thread"""
+        Args:
+            timeout (float, optional): seconds to wait. Defaults to 120.
 
-        def start_server(_port: int = 80):
-            server = http.server.HTTPServer(("", _port), self.RequestHandler)
-            server.serve_forever()
+        Returns:
+            str: the activation code, or None if it never came
+        """
+        try:
+            await asyncio.wait_for(self._activation_event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return None
+        return self.activationCode
 
-        thread = Thread(target=start_server, args=(port,))
-        thread.start()
+    async def start_http_server(self, port: int = 80) -> aiohttp.web.AppRunner:
+        """Serves the oauth redirect on the running event loop.
 
-        return thread
+        The server stops itself once microsoft redirects back with a code.
+
+        Args:
+            port (int, optional): the port to listen on. Defaults to 80.
+
+        Returns:
+            aiohttp.web.AppRunner: the runner of the server
+        """
+        runner = None
+        self.activationCode = None
+        self._activation_event.clear()
+
+        async def handle_redirect(request: aiohttp.web.Request):
+            code = request.query.get("code")
+            if code is not None:
+                self.activationCode = code
+                self._activation_event.set()
+                asyncio.get_running_loop().create_task(runner.cleanup())
+            return aiohttp.web.Response(
+                text="Thanks for logging in!", content_type="text/html"
+            )
+
+        app = aiohttp.web.Application()
+        app.router.add_get("/{tail:.*}", handle_redirect)
+        runner = aiohttp.web.AppRunner(app)
+        await runner.setup()
+        await aiohttp.web.TCPSite(runner, port=port).start()
+
+        return runner
+
+    @classmethod
+    def _entropy(cls, n: int) -> bytes:
+        """
+        Returns n random bytes from a pool refilled with one large draw,
+        instead of a syscall per verifier or shared secret.
+
+        :param n: The number of bytes
+
+        :return: The random bytes
+        """
+        with cls._entropy_lock:
+            if cls._entropy_offset + n > len(cls._entropy_pool):
+                cls._entropy_pool = secrets.token_bytes(max(n, 6144))
+                cls._entropy_offset = 0
+            start = cls._entropy_offset
+            cls._entropy_offset += n
+            return cls._entropy_pool[start : start + n]
 
     @staticmethod
     def _generate_pkce_data() -> Tuple[str, str, Literal["plain", "S256"]]:
@@ -748,10 +925,13 @@ class Minecraft:
 
         :return: A tuple containing the code_verifier, the code_challenge, and the code_challenge_method.
         """
-        code_verifier = secrets.token_urlsafe(128)[:128]
-        code_challenge = urlsafe_b64encode(
-            sha256(code_verifier.encode("ascii")).digest()
-        ).decode("ascii")[:-1]
+        # 96 random bytes encode to exactly 128 url-safe chars, the max verifier length
+        code_verifier = urlsafe_b64encode(Minecraft._entropy(96)).decode("ascii")
+        code_challenge = (
+            urlsafe_b64encode(sha256(code_verifier.encode("ascii")).digest())
+            .rstrip(b"=")
+            .decode("ascii")
+        )
         code_challenge_method = "S256"
         return (
             code_verifier,
@@ -759,59 +939,126 @@ class Minecraft:
             cast(Literal["plain", "S256"], code_challenge_method),
         )
 
-    async def session_join(self, mine_token, server_hash, _uuid, name, tries=0):
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Returns the shared http session, creating it if needed.
+
+        Returns:
+            aiohttp.ClientSession: the shared session
+        """
+        session = _loop_session.get()
+        if session is not None:
+            return session
+        if self._http is None or self._http.closed:
+            # aiodns when installed, the connector doesn't close it for us
+            self._resolver = _Resolver()
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=0,
+                    limit_per_host=32,
+                    resolver=self._resolver,
+                    ttl_dns_cache=600,
+                    keepalive_timeout=75,
+                )
+            )
+        return self._http
+
+    async def warmup(self):
+        """Connects to the auth hosts ahead of time, so the login chain skips
+        DNS and the TLS handshakes. Only call it right before the chain starts,
+        idle connections are dropped after the connector's keep-alive (75s)"""
+        # the pool is still warm from a recent login, don't ping the hosts again
+        now = time.monotonic()
+        if now - self._warmed_at < 60:
+            return
+        self._warmed_at = now
+
+        httpSession = await self.get_session()
+
+        async def prime(host: str):
+            # the answer doesn't matter, the pooled keep-alive connection does
+            async with httpSession.head(f"https://{host}/", allow_redirects=False):
+                pass
+
+        await asyncio.gather(
+            *(prime(host) for host in self.AUTH_HOSTS),
+            return_exceptions=True,
+        )
+
+    async def close(self):
+        """Closes the shared http session"""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        if self._resolver is not None:
+            await self._resolver.close()
+        self._http = None
+        self._resolver = None
+
+    async def session_join(self, mine_token, server_hash, _uuid, name):
+        """Tells mojang that the account is joining a server.
+
+        Args:
+            mine_token (str): the minecraft token of the account
+            server_hash (str): the server hash from the encryption request
+            _uuid (str): the uuid of the account, without dashes
+            name (str): the name of the account
+
+        Returns:
+            int: 0 on success, 1 on failure
+        """
         try:
-            if tries > 5:
-                self.logger.print("Failed to authenticate account after 5 tries")
-                return 1
-            async with aiohttp.ClientSession() as httpSession:
-                url = "https://sessionserver.mojang.com/session/minecraft/join"
-                async with httpSession.post(
-                    url,
-                    json={
-                        "accessToken": mine_token,
-                        "selectedProfile": {
-                            "id": _uuid.replace("-", ""),
-                            "name": name,
-                        },
-                        "serverId": server_hash,
-                    },
-                    headers={
-                        "Content-Type": "application/json",
+            httpSession = await self.get_session()
+            url = "https://sessionserver.mojang.com/session/minecraft/join"
+            # serialized once, retries resend the same bytes
+            payload = json_dumps(
+                {
+                    "accessToken": mine_token,
+                    "selectedProfile": {
+                        "id": _uuid,
+                        "name": name,
                     },
+                    "serverId": server_hash,
+                }
+            )
+            for tries in range(6):
+                # exponential backoff with jitter, so concurrent joins spread out
+                delay = min(8.0, 0.25 * (1 << tries)) + random.random() * 0.1
+                async with httpSession.post(
+                    url, data=payload, headers=_JSON_HEADERS
                 ) as res:
-                    if res.status == 204:  # success
-                        self.logger.debug(
-                            "Authenticated account successfully " + (await res.text())
-                        )
+                    if res.status == 204:  # success, there is no body to read
+                        self.logger.debug("Authenticated account successfully")
                         return 0
                     elif res.status == 403:  # bad something
-                        jres = await res.json()
+                        jres = json_loads(await res.read())
                         self.logger.print("Failed to authenticate account")
                         self.logger.print(jres["errorMessage"])
+                        return 1
                     elif res.status == 503:  # service unavailable
-                        # wait 1 second and try again
                         self.logger.print("Service unavailable")
-                        await asyncio.sleep(1)
-                        return await self.session_join(
-                            mine_token, server_hash, _uuid, name, tries + 1
-                        )
                     elif res.status == 429:
-                        tries += 1
-                        await asyncio.sleep(5)
                         self.logger.debug(
                             "Rate limited, trying again: " + (await res.text())
                         )
-                        return await self.session_join(
-                            mine_token, server_hash, _uuid, name, tries
-                        )
+                        # wait as long as mojang asks, 5s if it doesn't say
+                        try:
+                            delay = max(delay, float(res.headers["Retry-After"]))
+                        except (KeyError, ValueError):
+                            delay = max(delay, 5.0)
                     else:
                         self.logger.print("Failed to authenticate account")
                         self.logger.error(res.status, await res.text())
+                        return 1
+
+                if tries == 5:
+                    break
+                # sleep outside the response so its connection goes back to the pool
+                await asyncio.sleep(delay)
 
+            self.logger.print("Failed to authenticate account after 5 tries")
             return 1
         except Exception:
             self.logger.error(traceback.format_exc())
+            return 1
 
     def compress_packet(
         self,
@@ -836,45 +1083,25 @@ class Minecraft:
         :return: None
         """
 
-        if threshold <= 0:
-            if encryptor:
-                packet = self.encrypt_data(packet.flush(), encryptor)
-                assert packet is not None
-
-            connection.write_buffer(packet)
-            return
-
-        data = packet.flush()
-
-        # get the total length of the packet
-        uncomp_len = len(data)
-
-        if uncomp_len < threshold:
-            # we can send uncompressed but in a different format
-            # data length is now 0
-            new_data = Connection()
-            new_data.write_varint(0)  # uncompressed data length
-            new_data.write(data)
+        # the pieces are joined once at the end instead of concatenated per step
+        parts = [packet.flush()]
 
-            if encryptor:
-                new_data = self.encrypt_data(new_data.flush(), encryptor)
-                assert new_data is not None
-
-            connection.write_buffer(new_data)
-            return
-
-        # compress the packet with zlib
-        cdata = zlib.compress(data)
-
-        packet = Connection()
-        packet.write_varint(uncomp_len)  # packet length (uncompressed)
-        packet.write(cdata)  # compressed data
+        if threshold > 0:
+            if len(parts[0]) < threshold:
+                # we can send uncompressed but in a different format
+                # data length is now 0
+                parts.insert(0, b"\x00")
+            else:
+                # packet length (uncompressed) + compressed data
+                # level 1 zlib trades a little ratio for speed
+                parts = [self.encode_varint(len(parts[0])), self.deflate(parts[0])]
 
         if encryptor:
-            packet = self.encrypt_data(packet.flush(), encryptor)
-            assert packet is not None
+            parts = [encryptor.update(b"".join(parts))]
 
-        connection.write_buffer(packet)
+        # frame it ourselves and send it in one write
+        parts.insert(0, self.encode_varint(sum(map(len, parts))))
+        connection.write(b"".join(parts))
 
     def read_compressed(self, con: Connection | TCPSocketConnection):
         """
@@ -890,15 +1117,20 @@ class Minecraft:
             else:
                 data = con
 
-            uncomp_len = data.read_varint()
-            cdata = data.read(data.remaining())
+            uncomp_len = self.read_varint(data)
 
             if uncomp_len == 0:
-                # the data is not compressed
-                data = cdata
-                uncomp_len = len(data)
-            else:
-                data = zlib.decompress(cdata)
+                # the data is not compressed, the rest of the buffer is the packet
+                return data
+
+            if uncomp_len > MAX_PACKET_LENGTH:
+                raise ValueError(
+                    f"Uncompressed length too large: {uncomp_len} > {MAX_PACKET_LENGTH}"
+                )
+
+            # inflate from a view of the receive buffer rather than a copy of it
+            with memoryview(data.received) as cdata:
+                data = self.inflate(cdata, uncomp_len)
 
             if len(data) != uncomp_len:
                 self.logger.print(
@@ -913,27 +1145,246 @@ class Minecraft:
             self.logger.error(traceback.format_exc())
             raise err
 
+    @staticmethod
+    def encode_varint(value: int) -> bytes:
+        """
+        Encodes a varint the same way Connection.write_varint does.
+
+        :param value: The value to encode
+
+        :return: The encoded varint
+        """
+        value &= 0xFFFFFFFF
+        # unrolled by magnitude instead of looping over continuation bits
+        if value < 0x80:
+            return _SMALL_VARINTS[value]
+        if value < 0x4000:
+            return bytes((value & 0x7F | 0x80, value >> 7))
+        if value < 0x200000:
+            return bytes((value & 0x7F | 0x80, (value >> 7) & 0x7F | 0x80, value >> 14))
+        if value < 0x10000000:
+            return bytes(
+                (
+                    value & 0x7F | 0x80,
+                    (value >> 7) & 0x7F | 0x80,
+                    (value >> 14) & 0x7F | 0x80,
+                    value >> 21,
+                )
+            )
+        return bytes(
+            (
+                value & 0x7F | 0x80,
+                (value >> 7) & 0x7F | 0x80,
+                (value >> 14) & 0x7F | 0x80,
+                (value >> 21) & 0x7F | 0x80,
+                value >> 28,
+            )
+        )
+
+    @staticmethod
+    @functools.lru_cache(maxsize=16)
+    def handshake_prefix(version: int) -> bytes:
+        """
+        Returns the packet id and protocol version of a handshake packet.
+
+        :param version: The protocol version
+
+        :return: The encoded prefix
+        """
+        return b"\x00" + Minecraft.encode_varint(version)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def server_hash_prefix(server_id: bytes):
+        """
+        Returns a sha1 state that has already hashed the server id.
+        Callers must copy() it before updating.
+
+        :param server_id: The server id from the encryption request
+
+        :return: The sha1 object
+        """
+        shaHash = sha1()  # skipcq: PTC-W1003
+        shaHash.update(server_id)
+        return shaHash
+
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def login_start_packet(version: int, username: str, uuid: bytes) -> bytes:
+        """
+        Builds a login start packet: ID, username, include sig data, has uuid, uuid.
+
+        :param version: The protocol version
+        :param username: The username of the account
+        :param uuid: The raw 16 bytes of the account's uuid
+
+        :return: The unframed packet
+        """
+        username_bytes = username.encode("utf-8")
+        packet = b"\x00" + Minecraft.encode_varint(len(username_bytes)) + username_bytes
+
+        if version > 758:
+            # older protocols don't want the uuid
+            # https://wiki.vg/index.php?title=Protocol&oldid=16918#Login_Start
+            if version <= 760:
+                # a few want signature data
+                # https://wiki.vg/index.php?title=Protocol&oldid=17753#Login_Start
+                packet += b"\x00"  # has sig data
+
+            if version in (760, 761, 762, 763):
+                # these want the uuid sometimes
+                # https://wiki.vg/index.php?title=Protocol&oldid=18375#Login_Start
+                packet += b"\x01"  # has uuid
+
+            # the uuid as its raw 16 bytes, the same as two big-endian 64-bit integers
+            packet += uuid
+
+        return packet
+
+    @staticmethod
+    def minecraft_sha1_hexdigest(digest: bytes) -> str:
+        """
+        Formats a sha1 digest the way minecraft does, as a signed two's complement
+        number in hex without leading zeros.
+
+        :param digest: The raw sha1 digest
+
+        :return: The hex string
+        """
+        n = int.from_bytes(digest, "big", signed=True)
+        return "-" + format(-n, "x") if n < 0 else format(n, "x")
+
+    @staticmethod
+    @functools.lru_cache(maxsize=1024)
+    def load_public_key(der: bytes):
+        """
+        Loads a server's DER public key, cached since servers keep theirs until restart.
+
+        :param der: The DER encoded public key
+
+        :return: The public key object
+        """
+        return load_der_public_key(der)
+
+    @staticmethod
+    def read_varint(con: Connection) -> int:
+        """
+        Reads a varint, with a fast path for the 1 and 2 byte values that
+        make up nearly all packet ids and lengths.
+
+        :param con: The connection to read from
+
+        :return: The varint
+        """
+        buf = getattr(con, "received", None)
+        if buf:
+            b0 = buf[0]
+            if b0 < 0x80:
+                del buf[:1]
+                return b0
+            if len(buf) > 1 and buf[1] < 0x80:
+                value = (b0 & 0x7F) | (buf[1] << 7)
+                del buf[:2]
+                return value
+
+        return con.read_varint()
+
+    @staticmethod
+    def read_bytes(con: Connection, length: int) -> bytes:
+        """
+        Reads length bytes as immutable bytes, copying them once instead of
+        Connection.read's slice, re-slice and later bytes() conversion.
+
+        :param con: The connection to read from
+        :param length: The number of bytes to read
+
+        :return: The bytes
+        """
+        buf = con.received
+        if len(buf) < length:
+            raise OSError(f"Not enough data to read! {len(buf)} < {length}")
+        with memoryview(buf) as view:
+            out = bytes(view[:length])
+        del buf[:length]
+        return out
+
+    def deflate(self, data: bytes) -> bytes:
+        """
+        Compresses data at level 1, preferring libdeflate, then ISA-L, then stdlib zlib.
+
+        :param data: The data to compress
+
+        :return: The zlib-wrapped compressed data
+        """
+        if libdeflate is not None:
+            return libdeflate.zlib_compress(data, 1)
+        if isal_zlib is not None:
+            return isal_zlib.compress(data, 1)
+
+        deflate = self._deflate.copy()
+        return deflate.compress(data) + deflate.flush()
+
+    def inflate(self, cdata: bytes, uncomp_len: int) -> bytes:
+        """
+        Decompresses zlib-wrapped data, preferring libdeflate, then ISA-L, then stdlib zlib.
+
+        The output is bound by the length the server announced, so a bad
+        packet can't inflate past it.
+
+        :param cdata: The compressed data
+        :param uncomp_len: The uncompressed length sent with the packet
+
+        :return: The decompressed data
+        """
+        if libdeflate is not None:
+            # libdeflate inflates into a buffer of exactly the announced size
+            return libdeflate.zlib_decompress(cdata, uncomp_len)
+        if isal_zlib is not None:
+            inflate = isal_zlib.decompressobj()
+        else:
+            inflate = self._inflate.copy()
+        return inflate.decompress(cdata, uncomp_len)
+
     def read_chat(self, chat: dict | str):
         try:
-            if isinstance(chat, str):
-                try:
-                    chat = json.loads(chat)
-                except json.JSONDecodeError:
-                    return chat
-            out = ""
-            if "text" in chat:
-                out += chat["text"]
-            if "extra" in chat:
-                for i in chat["extra"]:
-                    out += self.read_chat(i)
-
-            if "translate" in chat:
-                out += chat["translate"] + ": "
-
-            if "with" in chat:
-                out += ", ".join(chat["with"])
-
-            return out
+            # walk the component tree with a stack, pieces that are already
+            # rendered are pushed as 1-tuples so the output order is kept
+            parts = []
+            stack = [chat]
+            while stack:
+                node = stack.pop()
+                if isinstance(node, tuple):
+                    parts.append(node[0])
+                    continue
+                if isinstance(node, str):
+                    try:
+                        parsed = json_loads(node)
+                    except json.JSONDecodeError:
+                        parsed = None
+                    if not isinstance(parsed, dict):
+                        parts.append(node)
+                        continue
+                    node = parsed
+
+                if "text" in node:
+                    parts.append(node["text"])
+
+                if "with" in node:
+                    args = node["with"]
+                    if not all(isinstance(arg, str) for arg in args):
+                        # translation arguments can be chat components too
+                        args = [
+                            self.read_chat(arg) if isinstance(arg, dict) else str(arg)
+                            for arg in args
+                        ]
+                    stack.append((", ".join(args),))
+                if "translate" in node:
+                    stack.append((node["translate"] + ": ",))
+
+                if "extra" in node:
+                    stack.extend(reversed(node["extra"]))
+
+            return "".join(parts)
         except Exception:
             self.logger.error(traceback.format_exc())
             return str(chat)
@@ -951,50 +1402,40 @@ class Minecraft:
             return None, None, None
 
     def decrypt_packet(
-        self, connection: TCPSocketConnection, decryptor: Cipher.decryptor
+        self, connection: Connection, decryptor: Cipher.decryptor
     ) -> Connection:
-        try:
-            # everything is encrypted so first receive all the data
-            data = connection.read(connection.remaining())
+        """
+        Decrypts a connection's whole receive buffer into a new connection.
 
-            # decrypt the data
-            unc_data = self.decrypt_data(data, decryptor)
+        The decryptor must live for the whole connection, AES/CFB8 is a
+        stream so it is only ever updated, never finalized.
 
-            return unc_data
-        except Exception:
-            self.logger.error(traceback.format_exc())
-            return Connection()
+        :param connection: The connection holding the encrypted data, emptied
+        :param decryptor: The decryptor of the connection
 
-    def decrypt_data(self, data: bytes, decryptor: Cipher.decryptor):
+        :return: The decrypted data in the receive buffer of a connection
+        """
         try:
-            assert len(data) > 0
-
-            unc_data = decryptor.update(data)
-
-            assert len(unc_data) > 0
-
             out = Connection()
-            out.receive(unc_data)
-            out.write(unc_data)
+            # decrypt straight into the new connection's receive buffer, CFB8
+            # output is the same length as its input but update_into wants a
+            # block of slack
+            out.received = bytearray(len(connection.received) + 15)
 
-            return out
-        except Exception:
-            self.logger.error(traceback.format_exc(), data)
-            return None
-
-    def encrypt_data(self, data: bytes, encryptor: Cipher.encryptor):
-        try:
-            enc_data = encryptor.update(data)
-            out = Connection()
-            out.receive(enc_data)
-            out.write(enc_data)
+            # everything is encrypted, so decrypt the whole receive buffer at once
+            with memoryview(connection.received) as data:
+                n = decryptor.update_into(data, out.received)
+            connection.received.clear()
+            del out.received[n:]
 
             return out
         except Exception:
             self.logger.error(traceback.format_exc())
-            return
+            return Connection()
 
-    def read_enc(self, conn: TCPSocketConnection, decryptor: Cipher.decryptor):
+    async def read_enc(
+        self, conn: "Minecraft.AsyncConnection", decryptor: Cipher.decryptor
+    ):
         """
         Reads an encrypted packet from the connection.
 
@@ -1003,21 +1444,32 @@ class Minecraft:
 
         :return: The decrypted packet
         """
-        data = []
-        while True:
+        # bound the drain so modded or honeypot servers that keep streaming
+        # can't hold the join open for longer than a couple of seconds
+        deadline = asyncio.get_running_loop().time() + 2.0
+        # chunks are appended to one buffer, decrypt_packet reads it in place
+        enc = Connection()
+        while len(enc.received) < 262144:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                break
             try:
-                data.append(conn.read(1))
-            except OSError:
-                self.logger.print(f"Finished reading packet after {len(data)} bytes")
+                chunk = await conn.read_available(remaining)
+            except (OSError, asyncio.TimeoutError):
+                chunk = b""
+            if not chunk:
                 break
-        data = b"".join(data)
+            enc.received += chunk
+        total = len(enc.received)
+        self.logger.print(f"Finished reading packet after {total} bytes")
 
-        unc = self.decrypt_data(data, decryptor)
+        assert total > 0
+        unc = self.decrypt_packet(enc, decryptor)
 
-        assert unc is not None
+        assert unc.remaining() > 0
 
         self.logger.debug(
-            f"Received {len(data)} bytes, decrypted to {unc.read_varint()} bytes"
+            f"Received {total} bytes, decrypted to {unc.read_varint()} bytes"
         )
 
         return unc
@@ -1,5 +1,9 @@
 import asyncio
-from typing import Optional
+import contextvars
+import io
+import time
+from typing import Any, Optional, Tuple
+from uuid import UUID
 
 import aiohttp
 import interactions
@@ -8,10 +12,19 @@ from .database import Database
 from .logger import Logger
 from .server import Server
 
+# a private session for blocking wrappers, whose temporary loop can't use the shared one
+_loop_session: contextvars.ContextVar[Optional[aiohttp.ClientSession]] = (
+    contextvars.ContextVar("_loop_session", default=None)
+)
+
 
 class Player:
     """Class to hold all the player-related functions"""
 
+    # how long mojang lookups are kept, misses are retried much sooner
+    CACHE_TTL = 3600
+    NEGATIVE_CACHE_TTL = 60
+
     def __init__(self, logger: "Logger", server: "Server", db: "Database"):
         """Initializes the Players class
 
@@ -24,6 +37,51 @@ class Player:
         self.server = server
         self.db = db
 
+        # shared http session, see get_session
+        self._http: Optional[aiohttp.ClientSession] = None
+        # lowercased name / dashless uuid -> (expiry, result), see _cached
+        self._uuid_cache: dict[str, Tuple[float, str]] = {}
+        self._profile_cache: dict[str, Tuple[float, dict]] = {}
+
+    @staticmethod
+    def _cached(cache: dict, key: str) -> Optional[Any]:
+        hit = cache.get(key)
+        if hit is None:
+            return None
+        if hit[0] <= time.monotonic():
+            del cache[key]
+            return None
+        return hit[1]
+
+    @staticmethod
+    def _store(cache: dict, key: str, value: Any, ttl: float):
+        if len(cache) >= 1024:
+            cache.clear()
+        cache[key] = (time.monotonic() + ttl, value)
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        """Returns the shared http session, creating it if needed.
+
+        Returns:
+            aiohttp.ClientSession: the shared session
+        """
+        session = _loop_session.get()
+        if session is not None:
+            return session
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100, ttl_dns_cache=300, keepalive_timeout=30
+                )
+            )
+        return self._http
+
+    async def close(self):
+        """Closes the shared http session"""
+        if self._http is not None and not self._http.closed:
+            await self._http.close()
+        self._http = None
+
     async def async_crack_check_api(self, host: str, port: str = "25565") -> bool:
         """Checks if a server is cracked using the mcstatus.io API
 
@@ -37,7 +95,8 @@ class Player:
         """
         url = "https://api.mcstatus.io/v2/status/java/" + host + ":" + str(port)
 
-        async with aiohttp.ClientSession() as session, session.get(url) as resp:
+        session = await self.get_session()
+        async with session.get(url) as resp:
             if resp.status == 200:
                 self.logger.debug("Server is cracked")
                 return (await resp.json())["eula_blocked"]
@@ -54,24 +113,29 @@ class Player:
             interactions.file | None: file object of the player head
         """
         url = "https://minotar.net/avatar/" + name
-        async with aiohttp.ClientSession() as session, session.get(url) as r:
+        session = await self.get_session()
+        async with session.get(url) as r:
             if r.status != 200:
                 self.logger.print("Player head not found")
                 return None
-            with open("playerhead.png", "wb") as f:
-                f.write(await r.read())
+            head = await r.read()
             self.logger.debug("Player head downloaded")
             return interactions.File(
-                file_name="playerhead.png",
-                file=open("playerhead.png", "rb"),
+                file_name=f"{name}.png",
+                file=io.BytesIO(head),
             )
 
     def get_uuid(self, name: str) -> str:
-        return asyncio.run(self.async_get_uuid(name))
+        async def run():
+            # the shared session may belong to the bot's loop, leave it alone
+            async with aiohttp.ClientSession() as session:
+                _loop_session.set(session)
+                return await self.async_get_uuid(name)
 
-    @staticmethod
-    async def async_get_uuid(name: str) -> str:
-        """Get the UUID of a player
+        return asyncio.run(run())
+
+    async def async_get_uuid(self, name: str) -> str:
+        """Get the UUID of a player, cached for an hour
 
         Args:
             name (str): player name
@@ -79,19 +143,26 @@ class Player:
         Returns:
             str: player UUID
         """
+        key = name.lower()
+        uuid = self._cached(self._uuid_cache, key)
+        if uuid is not None:
+            return uuid
+
         url = "https://api.mojang.com/users/profiles/minecraft/" + name
-        async with aiohttp.ClientSession() as session, session.get(url) as resp:
+        session = await self.get_session()
+        async with session.get(url) as resp:
             if resp.status == 200:
-                uuid = (await resp.json())["id"]
-                return (
-                    f"{uuid[:8]}-{uuid[8:12]}-{uuid[12:16]}-{uuid[16:20]}-{uuid[20:]}"
-                )
+                uuid = str(UUID(hex=(await resp.json())["id"]))
+                self._store(self._uuid_cache, key, uuid, self.CACHE_TTL)
+                return uuid
             else:
+                if resp.status in (204, 404):
+                    # the name may be claimed soon, don't remember it for long
+                    self._store(self._uuid_cache, key, "", self.NEGATIVE_CACHE_TTL)
                 return ""
 
-    @staticmethod
-    async def async_get_profile(uuid: str) -> dict:
-        """Get the profile of a player
+    async def async_get_profile(self, uuid: str) -> dict:
+        """Get the profile of a player, cached for an hour
 
         Args:
             uuid (str): player uuid
@@ -99,11 +170,21 @@ class Player:
         Returns:
             dict: player profile
         """
+        key = uuid.lower().replace("-", "")
+        profile = self._cached(self._profile_cache, key)
+        if profile is not None:
+            return profile
+
         url = "https://sessionserver.mojang.com/session/minecraft/profile/" + uuid
-        async with aiohttp.ClientSession() as session, session.get(url) as resp:
+        session = await self.get_session()
+        async with session.get(url) as resp:
             if resp.status == 200:
-                return await resp.json()
+                profile = await resp.json()
+                self._store(self._profile_cache, key, profile, self.CACHE_TTL)
+                return profile
             else:
+                if resp.status in (204, 404):
+                    self._store(self._profile_cache, key, {}, self.NEGATIVE_CACHE_TTL)
                 return {}
 
     async def async_player_list(
@@ -94,7 +94,7 @@ serverLib = utils.server
 mcLib = utils.mc
 
 
-async def main():
+async def rescan():
     pipeline = [
         {
             "$match": {
@@ -169,5 +169,13 @@ async def main():
             )
 
 
+async def main():
+    try:
+        await rescan()
+    finally:
+        # the shared http sessions belong to this loop
+        await utils.close()
+
+
 if __name__ == "__main__":
     asyncio.run(main())
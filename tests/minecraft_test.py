@@ -0,0 +1,253 @@
+import json
+import logging
+import os
+import sys
+from hashlib import sha1
+from uuid import UUID
+
+import pytest
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+from mcstatus.protocol.connection import Connection
+
+try:
+    from pyutils import minecraft
+    from pyutils.minecraft import Minecraft
+except ImportError:
+    sys.path.append(os.path.dirname(
+        os.path.dirname(os.path.abspath(__file__))))
+    from pyutils import minecraft
+    from pyutils.minecraft import Minecraft
+
+
+def make_minecraft():
+    logger = logging.getLogger("minecraft_test")
+    return Minecraft(logger=logger, server=None, player=None, text=None)
+
+
+# Server hash tests, vectors from https://wiki.vg/Protocol_Encryption#Client
+def test_sha1_hexdigest_positive():
+    digest = sha1(b"Notch").digest()
+
+    assert (
+        Minecraft.minecraft_sha1_hexdigest(digest)
+        == "4ed1f46bbe04bc756bcb17c0c7ce3e4632f06a48"
+    )
+
+
+def test_sha1_hexdigest_negative():
+    digest = sha1(b"jeb_").digest()
+
+    assert (
+        Minecraft.minecraft_sha1_hexdigest(digest)
+        == "-7c9d5b0044c130109a5d7b5fb5c317c02b4e28c1"
+    )
+
+
+def test_sha1_hexdigest_leading_zero():
+    digest = sha1(b"simon").digest()
+
+    assert (
+        Minecraft.minecraft_sha1_hexdigest(digest)
+        == "88e16a1019277b15d58faf0541e11910eb756f6"
+    )
+
+
+# Varint tests
+def test_encode_varint_boundaries():
+    values = [0, 1, 127, 128, 16383, 16384, 2097151, 2097152]
+    values += [268435455, 268435456, 2147483647]
+
+    for value in values:
+        con = Connection()
+        con.write_varint(value)
+
+        assert Minecraft.encode_varint(value) == bytes(con.flush()), value
+
+
+def test_encode_varint_negative():
+    for value in [-1, -2, -128, -2147483648]:
+        con = Connection()
+        con.write_varint(value)
+
+        encoded = Minecraft.encode_varint(value)
+        assert encoded == bytes(con.flush()), value
+        assert len(encoded) == 5
+
+
+# Login start tests
+def login_start_reference(version: int, username: str, uuid: UUID) -> bytes:
+    # the packet as it used to be written field by field
+    con = Connection()
+    con.write_varint(0)
+    con.write_utf(username)
+
+    if version > 758:
+        if version <= 760:
+            con.write_bool(False)
+
+        if version in [760, 761, 762, 763]:
+            con.write_bool(True)
+
+        con.write_ulong(int(uuid.hex[:16], 16))
+        con.write_ulong(int(uuid.hex[16:], 16))
+
+    return bytes(con.flush())
+
+
+def test_login_start_packet():
+    uuid = UUID("069a79f4-44e9-4726-a5be-fca90e38aaf5")
+
+    for version in [47, 758, 759, 760, 761, 763, 764, 765]:
+        assert Minecraft.login_start_packet(
+            version, "Notch", uuid.bytes
+        ) == login_start_reference(version, "Notch", uuid), version
+
+
+# Varint reading tests
+def test_read_varint_matches_connection():
+    values = [0, 1, 127, 128, 255, 16383, 16384, 2097151, 2097152, 2147483647, -1]
+
+    for value in values:
+        con = Connection()
+        con.write_varint(value)
+        con.write(b"\xff")  # trailing data must be left alone
+        data = con.flush()
+
+        fast = Connection()
+        fast.receive(data)
+        slow = Connection()
+        slow.receive(data)
+
+        assert Minecraft.read_varint(fast) == slow.read_varint(), value
+        assert fast.received == slow.received == bytearray(b"\xff"), value
+
+
+def test_read_varint_truncated():
+    con = Connection()
+    con.receive(b"\x80")
+
+    with pytest.raises(OSError):
+        Minecraft.read_varint(con)
+
+
+# Chat tests
+def read_chat_reference(chat):
+    # the recursive walk read_chat replaced, for plain string arguments
+    if isinstance(chat, str):
+        try:
+            chat = json.loads(chat)
+        except json.JSONDecodeError:
+            return chat
+    out = ""
+    if "text" in chat:
+        out += chat["text"]
+    if "extra" in chat:
+        for i in chat["extra"]:
+            out += read_chat_reference(i)
+    if "translate" in chat:
+        out += chat["translate"] + ": "
+    if "with" in chat:
+        out += ", ".join(chat["with"])
+    return out
+
+
+def test_read_chat_matches_recursive_walk():
+    mc = make_minecraft()
+    chats = [
+        "You are not whitelisted on this server!",
+        {"text": "plain"},
+        {"text": "a", "extra": [{"text": "b"}, {"text": "c", "extra": ["d"]}]},
+        {"translate": "multiplayer.disconnect.incompatible", "with": ["1.20.1"]},
+        {
+            "text": "x",
+            "translate": "t",
+            "with": ["1", "2"],
+            "extra": [{"text": "y", "translate": "u"}, {"extra": [{"text": "z"}]}],
+        },
+        json.dumps({"text": "kicked", "extra": [{"text": " for"}, " fun"]}),
+    ]
+
+    for chat in chats:
+        assert mc.read_chat(chat) == read_chat_reference(chat), chat
+
+
+def test_read_chat_nested_with():
+    mc = make_minecraft()
+    chat = {
+        "translate": "multiplayer.disconnect.incompatible",
+        "with": [{"text": "1.20", "extra": [{"text": ".1"}]}, 763],
+    }
+
+    assert mc.read_chat(chat) == "multiplayer.disconnect.incompatible: 1.20.1, 763"
+
+
+# Compression tests
+@pytest.fixture(params=["libdeflate", "isal", "zlib"])
+def codec(request, monkeypatch):
+    # run the packet codec through each backend deflate/inflate can pick
+    if request.param == "libdeflate" and minecraft.libdeflate is None:
+        pytest.skip("libdeflate is not installed")
+    if request.param == "isal" and minecraft.isal_zlib is None:
+        pytest.skip("isal is not installed")
+    if request.param != "libdeflate":
+        monkeypatch.setattr(minecraft, "libdeflate", None)
+    if request.param == "zlib":
+        monkeypatch.setattr(minecraft, "isal_zlib", None)
+    return request.param
+
+
+def read_frame(data: bytes) -> Connection:
+    con = Connection()
+    con.receive(data)
+    length = Minecraft.read_varint(con)
+    assert length == con.remaining()
+    return con
+
+
+@pytest.mark.parametrize("size", [1, 255, 256, 300000])
+@pytest.mark.parametrize("threshold", [0, 256])
+def test_compress_round_trip(codec, size, threshold):
+    mc = make_minecraft()
+    payload = b"\x00" + bytes(range(256)) * (size // 256) + b"\x01" * (size % 256)
+
+    packet = Connection()
+    packet.write(payload)
+    out = Connection()
+    mc.compress_packet(packet, out, threshold)
+
+    frame = read_frame(bytes(out.flush()))
+    if threshold > 0:
+        frame = mc.read_compressed(frame)
+
+    assert bytes(frame.received) == payload
+
+
+# Encryption tests
+def make_cipher():
+    key = bytes(range(16))
+    return Cipher(algorithms.AES(key), modes.CFB8(key))
+
+
+@pytest.mark.parametrize("threshold", [0, 256])
+def test_decrypt_packet(threshold):
+    mc = make_minecraft()
+    encryptor = make_cipher().encryptor()
+    decryptor = make_cipher().decryptor()
+
+    # the decryptor is a stream, every packet continues where the last stopped
+    for payload in [b"\x03\x01", b"\x00" + os.urandom(5000), b"\x01" * 300]:
+        packet = Connection()
+        packet.write(payload)
+        out = Connection()
+        mc.compress_packet(packet, out, threshold)
+
+        received = Connection()
+        received.receive(encryptor.update(bytes(out.flush())))
+        frame = mc.decrypt_packet(received, decryptor)
+
+        assert received.received == bytearray()
+        frame = read_frame(bytes(frame.received))
+        if threshold > 0:
+            frame = mc.read_compressed(frame)
+
+        assert bytes(frame.received) == payload